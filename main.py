@@ -25,8 +25,9 @@ try:
     obj.main()
     logger.info(">>>>>> %s completed <<<<<<\n\nx==========x", STAGE_NAME)
 except Exception as e:
-    logger.error(CustomException(e))
-    raise CustomException(e) from e
+    custom_exception = CustomException(e)
+    logger.error(custom_exception)
+    raise custom_exception from e
 
 
 STAGE_NAME = "Data Processing Stage"
@@ -37,5 +38,6 @@ try:
     obj.main()
     logger.info(">>>>>> %s completed <<<<<<\n\nx==========x", STAGE_NAME)
 except Exception as e:
-    logger.error(CustomException(e))
-    raise CustomException(e) from e
+    custom_exception = CustomException(e)
+    logger.error(custom_exception)
+    raise custom_exception from e
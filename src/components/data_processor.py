@@ -2,8 +2,14 @@
 summary
 """
 
+import asyncio
+import re
+import sqlite3
+from contextlib import closing
 from os.path import dirname, normpath
 
+import numpy as np
+import orjson
 import pandas as pd
 
 from src.constants import CONFIGS
@@ -11,12 +17,27 @@ from src.exception import CustomException
 from src.logger import logger
 from src.utils.basic_utils import (
     create_directories,
-    get_lat_long,
-    get_postcode,
+    geocode_many,
+    parse_lat_long,
+    parse_postcode,
     read_yaml,
 )
 
 
+# Address pattern capturing the first state and, independently of it, the last
+# postcode, each through its own lookahead from the start of the address
+ADDRESS_RE = re.compile(
+    r"^(?=(?:.+?(?P<state>[A-Z]{2,3}|Victoria|Vic|Western Australia))?)"
+    r"(?=(?:.* (?P<postcode>\d{4}))?)"
+)
+
+# Spelled-out state names and their abbreviations
+STATE_ALIASES = {"Vic": "VIC", "Victoria": "VIC", "Western Australia": "WA"}
+
+# Separator of the services listed in "services_offered"
+SERVICES_SEP_RE = re.compile(r"\s*,\s*")
+
+
 class DataProcessor:
     """
     summary
@@ -27,62 +48,109 @@ class DataProcessor:
         self.configs = read_yaml(CONFIGS).data_processor
 
         # Inputs
+        self.max_connections = self.configs.max_connections
+        self.requests_per_second = self.configs.requests_per_second
+        self.geocode_cache_path = normpath(self.configs.geocode_cache_path)
         self.scraped_data_path = normpath(self.configs.scraped_data_path)
 
         # Output file paths
         self.processed_data_path = normpath(self.configs.processed_data_path)
 
-    @staticmethod
-    def apply_lat_long_fn(row):
-        if pd.isnull(row["latitude"]) or pd.isnull(row["longitude"]):
-            coordinates = get_lat_long(row["address"])
-            latitude, longitude = coordinates["lat"], coordinates["long"]
-            return latitude, longitude
-        else:
-            return row["latitude"], row["longitude"]
-
-    @staticmethod
-    def apply_postcode_function(row):
-        if pd.isnull(row["postcode"]):
-            postcode = get_postcode(row["address"])[0]
-            return postcode
-        else:
-            return row["postcode"]
+    def geocode(self, addresses: pd.Series, cache: sqlite3.Connection) -> dict:
+        """
+        Searches the given addresses concurrently on Nominatim. Results are
+        persisted in the cache under the normalized address, so any address
+        seen before (in this or a previous run, regardless of letter case or
+        surrounding spaces) is served from there without a network call.
+
+        Args:
+            addresses (pd.Series): The addresses to be searched.
+            cache (sqlite3.Connection): The persistent store of search results.
+
+        Returns:
+            dict: The search results keyed by address, None for the addresses
+            whose search failed.
+        """
+        keys = {address: address.strip().lower() for address in addresses.unique()}
+
+        # Look up the previously searched addresses
+        found = {}
+        for key in set(keys.values()):
+            row = cache.execute(
+                "SELECT result FROM geocodes WHERE address = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                found[key] = orjson.loads(row[0])
+
+        uncached = {key: addr for addr, key in keys.items() if key not in found}
+        logger.info("%s of %s addresses need geocoding", len(uncached), len(keys))
+
+        results = asyncio.run(
+            geocode_many(
+                list(uncached.values()), self.max_connections, self.requests_per_second
+            )
+        )
+
+        # Failed searches are never cached
+        with cache:
+            for address, result in results.items():
+                found[keys[address]] = result
+                if result is not None:
+                    cache.execute(
+                        "INSERT OR REPLACE INTO geocodes VALUES (?, ?)",
+                        (keys[address], orjson.dumps(result).decode()),
+                    )
+
+        return {address: found[key] for address, key in keys.items()}
 
     def data_transformation(self):
         try:
             # import the dataset
-            df = pd.read_csv(self.scraped_data_path)
+            df = pd.read_parquet(self.scraped_data_path)
             logger.info("Dataset imported")
 
-            # Drop duplicate rows
-            df_unq = df.drop(columns="scrape_ts").drop_duplicates()
-            df = df.loc[df_unq.index]
+            # Drop duplicate rows, ignoring the scrape timestamp
+            df = df.drop_duplicates(subset=df.columns.drop("scrape_ts"))
             logger.info("Duplicate entries dropped")
 
-            # Populate latitude and longitude, if absent
-            df["latitude"], df["longitude"] = zip(
-                *df.apply(self.apply_lat_long_fn, axis=1)
-            )
-            logger.info("Latitude and Longitude populated, if absent")
-
-            # Extract state and postcode from address
-            df["state"] = df["address"].str.extract(
-                r".+?((?:[A-Z]{2,3}|Victoria|Vic|Western Australia))", expand=False
-            )
-            df["postcode"] = df["address"].str.extract(r".* (\d{4})", expand=False)
+            # Extract state and postcode from address in a single pass
+            df[["state", "postcode"]] = df["address"].str.extract(ADDRESS_RE)
             logger.info("State and postcode extracted from the address")
 
             # Handle inconsistencies in "state" column
-            df["state"] = (
-                df["state"]
-                .str.replace(r"Vic(?:toria)?", "VIC", regex=True)
-                .str.replace("Western Australia", "WA")
-            )
+            df["state"] = df["state"].replace(STATE_ALIASES)
             logger.info("Handled in the inconsistencies in the state names")
 
-            # Populate postcode, if absent
-            df["postcode"] = df.apply(self.apply_postcode_function, axis=1)
+            # Populate the missing values through the geocoding cache
+            create_directories([dirname(self.geocode_cache_path)], verbose=False)
+            with closing(sqlite3.connect(self.geocode_cache_path)) as geocode_cache:
+                geocode_cache.execute(
+                    "CREATE TABLE IF NOT EXISTS geocodes "
+                    "(address TEXT PRIMARY KEY, result TEXT NOT NULL)"
+                )
+                missing_coords = df["latitude"].isnull() | df["longitude"].isnull()
+                missing_postcode = df["postcode"].isnull()
+                searches = self.geocode(
+                    df.loc[missing_coords | missing_postcode, "address"], geocode_cache
+                )
+
+            # Populate latitude and longitude, if absent (failed or empty
+            # searches leave them missing)
+            coordinates = [
+                parse_lat_long(searches[address])
+                if searches[address]
+                else {"lat": np.nan, "long": np.nan}
+                for address in df.loc[missing_coords, "address"]
+            ]
+            df.loc[missing_coords, "latitude"] = [c["lat"] for c in coordinates]
+            df.loc[missing_coords, "longitude"] = [c["long"] for c in coordinates]
+            logger.info("Latitude and Longitude populated, if absent")
+
+            # Populate postcode, if absent (failed or empty searches leave it missing)
+            df.loc[missing_postcode, "postcode"] = [
+                parse_postcode(searches[address]) if searches[address] else None
+                for address in df.loc[missing_postcode, "address"]
+            ]
             logger.info("Postcode populated, if absent")
 
             # Add an index column
@@ -94,27 +162,17 @@ class DataProcessor:
             df = df.reset_index()
             logger.info("Added a unique row ID for each distinct row")
 
-            # Unpivot "services_offered" column and strip contents
-            df["services_offered"] = df["services_offered"].str.split(",")
+            # Unpivot "services_offered" column, stripping contents while splitting
+            df["services_offered"] = (
+                df["services_offered"].str.strip().str.split(SERVICES_SEP_RE)
+            )
             df_exploded = df.explode("services_offered")
-            df_exploded["services_offered"] = df_exploded[
-                "services_offered"
-            ].str.strip()
             logger.info("Unpivot service offered column")
 
-            # Use correct datatype for numeric columns
-            df_exploded["latitude"] = pd.to_numeric(
-                df_exploded["latitude"], errors="coerce"
-            )
-            df_exploded["longitude"] = pd.to_numeric(
-                df_exploded["longitude"], errors="coerce"
-            )
-            df_exploded["scrape_ts"] = pd.to_datetime(df_exploded["scrape_ts"])
-            logger.info("Provided proper datatype to columns")
-
             # Fixing issue in Longitude
-            df_exploded["longitude"] = df_exploded["longitude"].apply(
-                lambda x: x + 100 if x < 100 else x
+            longitude = df_exploded["longitude"].to_numpy()
+            df_exploded["longitude"] = np.where(
+                longitude < 100, longitude + 100, longitude
             )
             logger.info("Fixing any source issues in the longitude column")
 
@@ -158,5 +216,6 @@ class DataProcessor:
             logger.info("Transformed data saved at: %s", self.processed_data_path)
             return None
         except Exception as e:
-            logger.error(CustomException(e))
-            raise CustomException(e) from e
+            custom_exception = CustomException(e)
+            logger.error(custom_exception)
+            raise custom_exception from e
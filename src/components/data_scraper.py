@@ -3,23 +3,31 @@ This module contains the ProductInfoScraper class, which is used for scraping
 product information from websites. It uses HTTP requests to retrieve the
 HTML content of product pages, and then uses the selectolax library to
 parse the HTML and extract the desired information. The scraped data is then
-stored in a CSV file.
+stored in a Parquet file.
 """
 
-import random
-import re
+import asyncio
 import time
 from dataclasses import asdict
 from datetime import datetime
-from os.path import exists, normpath
+from os.path import dirname, normpath
+from urllib.parse import parse_qs, urlparse
 
 import httpx
+import pandas as pd
+from aiolimiter import AsyncLimiter
 from selectolax.parser import HTMLParser
 
 from src.constants import CONFIGS, ServiceInfo
 from src.exception import CustomException
 from src.logger import logger
-from src.utils.basic_utils import read_csv, read_yaml, write_to_csv
+from src.utils.basic_utils import (
+    create_directories,
+    create_http_client,
+    read_csv_df,
+    read_yaml,
+    write_to_parquet,
+)
 
 
 class DataScraper:
@@ -29,7 +37,7 @@ class DataScraper:
     details from a given URL, as well as for scraping multiple products
     from a list of URLs. The class uses various libraries and modules, such
     as httpx, fake_useragent, and selectolax, to perform the scraping tasks.
-    The scraped data is stored in a CSV file.
+    The scraped data is stored in a Parquet file.
     """
 
     def __init__(self):
@@ -39,90 +47,142 @@ class DataScraper:
         # Inputs
         self.user_agent = self.configs.user_agent
         self.timeout = self.configs.timeout
-        self.clear = self.configs.clear_contents
+        self.max_concurrency = self.configs.max_concurrency
+        self.keepalive_expiry = self.configs.keepalive_expiry
+        self.requests_per_second = self.configs.requests_per_second
+        self.use_cache = self.configs.use_cache
+        self.cache_dir = normpath(self.configs.cache_dir)
+        self.cache_ttl = self.configs.cache_ttl
         self.links_data_path = normpath(self.configs.links_data_path)
 
         # Output file paths
         self.scraped_data_path = normpath(self.configs.scraped_data_path)
 
-        # Clear the files if exists
-        if self.clear:
-            if exists(self.scraped_data_path):
-                with open(self.scraped_data_path, "w", encoding="utf-8") as f:
-                    f.truncate()
-                logger.info("Cleared existing contents from %s", self.scraped_data_path)
+        # HTTP client of the ongoing scraping run, created anew by every run
+        self.client = None
 
-    def get_service_details(self, svc_url: str, svc_nm_crd: str, svc_adrs_crd: str):
+    def create_client(self) -> httpx.AsyncClient:
         """
-        Fetches and parses the product details from a given product URL.
+        Creates the HTTP client of a scraping run, shared by all its requests,
+        along with a fresh token bucket smoothing the network request rate
+        across all workers. Every run gets its own client, as a closed client
+        cannot be reopened.
+
+        Returns:
+            httpx.AsyncClient: The HTTP client of the scraping run.
+        """
+        return create_http_client(
+            headers={"User-Agent": self.user_agent, "accept-language": "en-US"},
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+            cache_dir=self.cache_dir if self.use_cache else None,
+            cache_ttl=self.cache_ttl,
+            limiter=AsyncLimiter(max_rate=self.requests_per_second, time_period=1),
+        )
+
+    async def get_service_details(
+        self, svc_url: str, svc_nm_crd: str, svc_adrs_crd: str, scrape_ts: str
+    ) -> dict:
+        """
+        Fetches the service page from a given service URL and hands the
+        response over to a worker thread for parsing, so the event loop keeps
+        serving other in-flight requests meanwhile.
+
+        Args:
+            svc_url (str): The URL of the service to be scraped.
+            svc_nm_crd (str): The service name shown on the listing card.
+            svc_adrs_crd (str): The service address shown on the listing card.
+            scrape_ts (str): The timestamp of the scraping run.
+
+        Returns:
+            dict: The scraped service details.
+        """
+        response = await self.client.get(svc_url)
+        return await asyncio.to_thread(
+            self.parse_service_details,
+            response,
+            svc_url,
+            svc_nm_crd,
+            svc_adrs_crd,
+            scrape_ts,
+        )
+
+    def parse_service_details(
+        self,
+        response: httpx.Response,
+        svc_url: str,
+        svc_nm_crd: str,
+        svc_adrs_crd: str,
+        scrape_ts: str,
+    ) -> dict:
+        """
+        Parses the service details from a service page response.
 
         Args:
-            product_url (str): The URL of the product to be scraped.
-            headers (str): The headers to be used in the HTTP request.
+            response (httpx.Response): The response of the service page.
+            svc_url (str): The URL of the scraped service.
+            svc_nm_crd (str): The service name shown on the listing card.
+            svc_adrs_crd (str): The service address shown on the listing card.
+            scrape_ts (str): The timestamp of the scraping run.
 
         Raises:
-            CustomException: If there is an error during the HTTP request
-            or parsing the response.
+            CustomException: If there is an error while parsing the response.
 
         Returns:
-            None: Writes the scraped product details to a CSV file.
+            dict: The scraped service details.
         """
-        headers = {"User-Agent": self.user_agent, "accept-language": "en-US"}
-        response = httpx.get(svc_url, headers=headers, timeout=self.timeout)
         try:
             logger.info(
-                "Request responded with the status code: %s", response.status_code
+                "Request responded with the status code: %s over %s",
+                response.status_code,
+                response.http_version,
             )
 
-            # Parse the HTML content
-            html = HTMLParser(response.text)
+            # Parse the raw HTML bytes, keeping only the location box subtree
+            location_box = HTMLParser(response.content).css_first("div.location-box")
 
-            # CSS selectors
-            service_name_css = "div.location-box h1"
-            address_css = "div.location-box div.info-block:first-of-type p a"
-            last_info_block = "div.location-box div.info-block:last-of-type"
+            # CSS selectors, relative to the location box
+            service_name_css = "h1"
+            address_css = "div.info-block:first-of-type p a"
+            last_info_block = "div.info-block:last-of-type"
             services_title_css = f"{last_info_block} div.info-block__title"
             services_offered_css = f"{last_info_block} div.info-block__desc p"
 
-            def fetch(selector, output="text"):
-                if html.css_first(selector):
-                    if output == "text":
-                        output = html.css_first(selector).text(strip=True)
-                    elif output == "link":
-                        output = html.css_first(selector).attrs["href"]
-                else:
-                    output = None
-                return output
-
-            # Service and service address
-            service_name = (
-                svc_nm_crd
-                if fetch(service_name_css) is None
-                else fetch(service_name_css)
-            )
-            service_address = (
-                svc_adrs_crd if fetch(address_css) is None else fetch(address_css)
-            )
+            def select(selector):
+                if location_box is None:
+                    return None
+                return location_box.css_first(selector)
 
-            # Address URL
-            address_url = fetch(address_css, "link")
+            def fetch(selector):
+                node = select(selector)
+                return None if node is None else node.text(strip=True)
 
-            # RegEx pattern match for latitude and longitudes
-            if address_url:
-                lat_long_pattern = re.compile(r".*\?q=(.*?)\,+(.*)")
-                matches = lat_long_pattern.match(address_url)
-                lat, long = matches.group(1), matches.group(2)
+            # Service name
+            service_name = fetch(service_name_css)
+            if service_name is None:
+                service_name = svc_nm_crd
+
+            # Service address and address URL
+            address_node = select(address_css)
+            if address_node is None:
+                service_address, address_url = svc_adrs_crd, None
             else:
-                lat, long = None, None
+                service_address = address_node.text(strip=True)
+                address_url = address_node.attrs["href"]
+
+            # Latitude and longitude from the `?q=<lat>,<long>` URL query
+            query = parse_qs(urlparse(address_url).query) if address_url else {}
+            lat_long = query.get("q", [""])[0].split(",", 1)
+            lat, long = lat_long if len(lat_long) == 2 else (None, None)
 
             # Services offered
-            if fetch(services_offered_css):
-                services_offered = (
-                    fetch(services_offered_css)
-                    if "Services" in fetch(services_title_css)
-                    else "Miscellaneous"
-                )
-            else:
+            services_title = fetch(services_title_css)
+            services_offered = fetch(services_offered_css)
+            if not services_offered or "Services" not in (services_title or ""):
                 services_offered = "Miscellaneous"
 
             # Get the product details in data class
@@ -133,50 +193,89 @@ class DataScraper:
                 longitude=long,
                 services_offered=services_offered,
                 details_url=svc_url,
-                scrape_ts=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                scrape_ts=scrape_ts,
             )
 
-            # Write scraped info into CSV file
-            write_to_csv(self.scraped_data_path, asdict(service_details))
+            return asdict(service_details)
 
         except Exception as e:
-            logger.error(CustomException(e))
-            raise CustomException(e) from e
+            custom_exception = CustomException(e)
+            logger.error(custom_exception)
+            raise custom_exception from e
 
-    def scrape_services(self) -> None:
+    async def scrape_services_async(self) -> None:
         """
-        Reads a CSV file with product URLs and scrapes each product's details.
-
-        The function generates random headers and sleep times between requests
-        to avoid being blocked by the server. The scraped product details are
-        written to a CSV file. The function logs the start and end time of the
-        scraping process, as well as the total time taken.
+        Reads a CSV file with service URLs and scrapes each service's details
+        concurrently over an async HTTP client created for the run, which is
+        closed once the run completes.
+
+        The number of in-flight requests is bounded by a semaphore sized from
+        the `max_concurrency` config and services are collected as they
+        complete, so slow pages never hold up fast ones, yet kept in the order
+        of their links so the output rows are stable across runs. Network
+        requests are paced by a token bucket shared by all workers, allowing
+        at most `requests_per_second` to avoid being blocked by the server,
+        while cached responses are served without delay. The scraped services
+        are then written to a Parquet file, with numeric coordinates and a
+        datetime scrape timestamp.
 
         Returns:
             None
         """
         # Read the CSV file with product links
-        service_links = read_csv(self.links_data_path)
+        service_links = read_csv_df(self.links_data_path)
 
-        # Scraping start time
-        start_time = time.time()
+        # Timestamp shared by every service scraped in this run
+        scrape_ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-        # Start scraping product in loop
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def scrape_service(link_idx: int, link: tuple) -> tuple:
+            async with semaphore:
+                service = await self.get_service_details(
+                    link.service_url, link.service_name, link.service_address, scrape_ts
+                )
+            return link_idx, service
+
+        # Start scraping services concurrently, collecting them as they finish
         logger.info("Services scraping started")
-        for idx, link in enumerate(service_links):
-            service_url = link["service_url"]
-            service_name_card = link["service_name"]
-            service_address_card = link["service_address"]
+        services = [None] * len(service_links)
+        async with self.create_client() as self.client:
+            tasks = [
+                scrape_service(link_idx, link)
+                for link_idx, link in enumerate(service_links.itertuples(index=False))
+            ]
+            for idx, task in enumerate(asyncio.as_completed(tasks), start=1):
+                link_idx, service = await task
+                services[link_idx] = service
+                logger.info("%s services detail scraped", idx)
+
+        # Provide proper datatype to columns
+        services_df = pd.DataFrame(services)
+        for col in ["latitude", "longitude"]:
+            services_df[col] = pd.to_numeric(services_df[col], errors="coerce")
+        services_df["scrape_ts"] = pd.to_datetime(services_df["scrape_ts"])
+
+        # create save directory if not exists
+        create_directories([dirname(self.scraped_data_path)])
+
+        # Export scraped data
+        write_to_parquet(self.scraped_data_path, services_df)
+        logger.info("Scraped data saved at: %s", self.scraped_data_path)
+
+    def scrape_services(self) -> None:
+        """
+        Runs the asynchronous services scraper to completion. The function
+        logs the start and end time of the scraping process, as well as the
+        total time taken.
 
-            # Generate random sleep time
-            sleep_sec = random.randint(1, 3)
+        Returns:
+            None
+        """
+        # Scraping start time
+        start_time = time.time()
 
-            # write services data to csv file
-            self.get_service_details(
-                service_url, service_name_card, service_address_card
-            )
-            logger.info("%s services detail scraped", idx + 1)
-            time.sleep(sleep_sec)
+        asyncio.run(self.scrape_services_async())
 
         # Scraping end time
         end_time = time.time()
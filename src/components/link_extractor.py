@@ -5,18 +5,33 @@ HTML parsing, and file I/O operations to scrape the website and save the
 extracted links to a CSV file.
 """
 
-import random
+import asyncio
 import time
+from csv import DictWriter
 from os.path import dirname, exists, normpath
 from urllib.parse import urljoin
 
 import httpx
+from aiolimiter import AsyncLimiter
 from selectolax.parser import HTMLParser
 
 from src.constants import CONFIGS
 from src.exception import CustomException
 from src.logger import logger
-from src.utils.basic_utils import create_directories, read_yaml, write_to_csv
+from src.utils.basic_utils import (
+    create_directories,
+    create_http_client,
+    read_yaml,
+)
+
+# Columns of the service links CSV file
+LINK_FIELDS = [
+    "page_number",
+    "page_url",
+    "service_url",
+    "service_name",
+    "service_address",
+]
 
 
 class LinkExtractor:
@@ -30,7 +45,7 @@ class LinkExtractor:
     -------
     - get_item_urls(): Retrieves the HTML content of a page, parses it, and
         extracts the product links. Returns the parsed HTML content.
-    - get_all_product_links(): Recursively extracts all product links from the
+    - get_all_product_links(): Iteratively extracts all product links from the
         website by navigating through the pages. Saves the links to the
         output CSV file.
     - scrape_product_links(): Executes the web scraping process by calling the
@@ -46,11 +61,22 @@ class LinkExtractor:
         self.root_url = self.configs.root_url
         self.user_agent = self.configs.user_agent
         self.timeout = self.configs.timeout
+        self.keepalive_expiry = self.configs.keepalive_expiry
+        self.requests_per_second = self.configs.requests_per_second
+        self.use_cache = self.configs.use_cache
+        self.cache_dir = normpath(self.configs.cache_dir)
+        self.cache_ttl = self.configs.cache_ttl
         self.clear = self.configs.clear_contents
 
         # Output file paths
         self.links_data_path = normpath(self.configs.links_data_path)
 
+        # HTTP client of the ongoing scraping run, created anew by every run
+        self.client = None
+
+        # CSV writer over the links file, kept open for the scraping run
+        self.links_writer = None
+
         # Clear the files if exists
         if self.clear:
             if exists(self.links_data_path):
@@ -58,7 +84,26 @@ class LinkExtractor:
                     f.truncate()
                 logger.info("Cleared existing contents from %s", self.links_data_path)
 
-    def get_urls(self, pg_url: str, pg_no: int) -> HTMLParser:
+    def create_client(self) -> httpx.AsyncClient:
+        """
+        Creates the HTTP client of a scraping run, shared by all its requests,
+        along with a fresh token bucket pacing the page requests reaching the
+        network. Every run gets its own client, as a closed client cannot be
+        reopened.
+
+        Returns:
+            httpx.AsyncClient: The HTTP client of the scraping run.
+        """
+        return create_http_client(
+            headers={"User-Agent": self.user_agent, "accept-language": "en-US"},
+            timeout=self.timeout,
+            limits=httpx.Limits(keepalive_expiry=self.keepalive_expiry),
+            cache_dir=self.cache_dir if self.use_cache else None,
+            cache_ttl=self.cache_ttl,
+            limiter=AsyncLimiter(max_rate=self.requests_per_second, time_period=1),
+        )
+
+    async def get_urls(self, pg_url: str, pg_no: int) -> HTMLParser:
         """
         Get the URLs of all items on a page.
 
@@ -72,20 +117,22 @@ class LinkExtractor:
         Returns:
             HTMLParser: The parsed HTML content of the page.
         """
-        headers = {"User-Agent": self.user_agent, "accept-language": "en-US"}
-        response = httpx.get(pg_url, headers=headers, timeout=self.timeout)
+        response = await self.client.get(pg_url)
         try:
             logger.info(
-                "Request responded with the status code: %s", response.status_code
+                "Request responded with the status code: %s over %s",
+                response.status_code,
+                response.http_version,
             )
 
-            # Parse the HTML content
-            parsed_html = HTMLParser(response.text)
+            # Parse the raw HTML bytes, the parser detects the encoding itself
+            parsed_html = HTMLParser(response.content)
 
             # Get the service URLs in the page
             services = parsed_html.css("div.white-box")  # > a
             logger.info("Total services listed in the page: %s", len(services))
 
+            rows = []
             for service in services:
                 service_url = service.css_first("a").attrs["href"]
                 service_name = service.css_first("h2").text(strip=True)
@@ -95,47 +142,67 @@ class LinkExtractor:
                     .replace("Address:", "")
                 )
 
-                data = {
-                    "page_number": pg_no,
-                    "page_url": pg_url,
-                    "service_url": service_url,
-                    "service_name": service_name,
-                    "service_address": service_address,
-                }
+                rows.append(
+                    {
+                        "page_number": pg_no,
+                        "page_url": pg_url,
+                        "service_url": service_url,
+                        "service_name": service_name,
+                        "service_address": service_address,
+                    }
+                )
 
-                write_to_csv(self.links_data_path, data)
+            # Write the page links in a single batch
+            self.links_writer.writerows(rows)
 
             # Return the parsed HTML content
             return parsed_html
         except Exception as e:
-            logger.error(CustomException(e))
-            raise CustomException(e) from e
+            custom_exception = CustomException(e)
+            logger.error(custom_exception)
+            raise custom_exception from e
 
-    def get_all_service_links(self, page_url: str, page_num: int = 1) -> None:
+    async def get_all_service_links(self, page_url: str, page_num: int = 1) -> None:
         """
-        Get all the product links on a page.
+        Get all the product links, following the pagination page by page.
+        Each parsed page is released before the next one is fetched.
 
         Args:
-            page_url (str): The URL of the page.
+            page_url (str): The URL of the first page.
             page_num (int, optional): The page number. Defaults to 1.
         """
-        # Generate random sleep time
-        sleep_sec = random.randint(1, 3)
-
-        # Write the product info and get the page HTML in variable
-        content = self.get_urls(page_url, page_num)
-        logger.info("Page-%s services links extracted", page_num)
-        time.sleep(sleep_sec)
-
-        # Increase the page number
-        page_num += 1
+        while page_url is not None:
+            # Write the product info and get the page HTML in variable
+            content = await self.get_urls(page_url, page_num)
+            logger.info("Page-%s services links extracted", page_num)
+
+            # Move on to the next page, if any
+            next_page_element = content.css_first("li.location-pagination__next a")
+            if next_page_element is None:
+                page_url = None
+            else:
+                page_url = urljoin(self.root_url, next_page_element.attrs["href"])
+            page_num += 1
+
+    async def scrape_service_links_async(self) -> None:
+        """
+        Extract all the service links over an async HTTP client created for
+        the run, which is closed once the run completes. The links file is
+        opened once with a large write buffer and every extracted link is
+        appended through the same CSV writer.
+        """
+        with open(
+            self.links_data_path, "a", newline="", encoding="utf-8", buffering=1 << 20
+        ) as links_file:
+            self.links_writer = DictWriter(links_file, fieldnames=LINK_FIELDS)
 
-        # recursively call to extract all product links
-        next_page_element = content.css_first("li.location-pagination__next a")
+            # Write the headers (only for the first time)
+            if links_file.tell() == 0:
+                self.links_writer.writeheader()
+                logger.info("CSV file: %s created successfully", self.links_data_path)
 
-        if next_page_element is not None:
-            next_page_url = urljoin(self.root_url, next_page_element.attrs["href"])
-            self.get_all_service_links(next_page_url, page_num)
+            async with self.create_client() as self.client:
+                await self.get_all_service_links(page_url=self.root_url)
 
     def scrape_service_links(self) -> None:
         """
@@ -145,7 +212,7 @@ class LinkExtractor:
         create_directories([dirname(self.links_data_path)])
 
         start_time = time.time()
-        self.get_all_service_links(page_url=self.root_url)
+        asyncio.run(self.scrape_service_links_async())
         end_time = time.time()
 
         time_diff = round(end_time - start_time, 2)
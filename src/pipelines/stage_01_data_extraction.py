@@ -38,8 +38,9 @@ class DataExtractionPipeline:
             data_scraper.scrape_services()
             logger.info("Services info extraction completed successfully")
         except Exception as excp:
-            logger.error(CustomException(excp))
-            raise CustomException(excp) from excp
+            custom_exception = CustomException(excp)
+            logger.error(custom_exception)
+            raise custom_exception from excp
 
 
 if __name__ == "__main__":
@@ -51,5 +52,6 @@ if __name__ == "__main__":
         obj.main()
         logger.info(">>>>>> %s completed <<<<<<\n\nx==========x", STAGE_NAME)
     except Exception as e:
-        logger.error(CustomException(e))
-        raise CustomException(e) from e
+        custom_exception = CustomException(e)
+        logger.error(custom_exception)
+        raise custom_exception from e
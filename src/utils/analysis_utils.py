@@ -9,7 +9,10 @@ DataFrame, and descriptive statistics about the object fields in the DataFrame.
 These functions can be used for exploratory data analysis and to gain insights about
 the data contained in a DataFrame.
 """
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 
 
 def dataframe_structure(dataframe: pd.DataFrame) -> dict:
@@ -23,16 +26,22 @@ def dataframe_structure(dataframe: pd.DataFrame) -> dict:
     Returns:
         dict: A dictionary containing details about the structure of the DataFrame.
     """
+    # Count the nulls in a single scan, every other datapoint is non-null
+    null_count = int(dataframe.isnull().to_numpy().sum())
+
+    # Measure the memory once, the deep scan walks every Python string
+    memory_usage = dataframe.memory_usage(deep=True)
+
     structure_details = {
         "Dimensions": dataframe.ndim,
         "Shape": dataframe.shape,
         "Row Count": len(dataframe),
         "Column Count": len(dataframe.columns),
         "Total Datapoints": dataframe.size,
-        "Null Datapoints": dataframe.isnull().sum().sum(),
-        "Non-Null Datapoints": dataframe.notnull().sum().sum(),
-        "Total Memory Usage": dataframe.memory_usage(deep=True).sum(),
-        "Average Memory Usage": dataframe.memory_usage(deep=True).mean().round(),
+        "Null Datapoints": null_count,
+        "Non-Null Datapoints": dataframe.size - null_count,
+        "Total Memory Usage": memory_usage.sum(),
+        "Average Memory Usage": memory_usage.mean().round(),
     }
 
     return structure_details
@@ -41,7 +50,7 @@ def dataframe_structure(dataframe: pd.DataFrame) -> dict:
 def datatype_details(dataframe: pd.DataFrame) -> str:
     """
     This function takes a pandas DataFrame as input and returns a string describing
-    the datatypes present in the DataFrame.
+    the datatypes present in the DataFrame, with the number of fields of each one.
 
     Args:
         dataframe (pd.DataFrame): The DataFrame to analyze.
@@ -49,10 +58,11 @@ def datatype_details(dataframe: pd.DataFrame) -> str:
     Returns:
         str: A string describing the datatypes present in the DataFrame.
     """
-    available_dtypes = list({str(dt) for dt in dataframe.dtypes})
-    for dt in available_dtypes:
-        field_count = dataframe.select_dtypes(dt).dtypes.count()
-        return f"There are {field_count} fields with {dt} datatype"
+    dtype_counts = dataframe.dtypes.astype(str).value_counts()
+    return "; ".join(
+        f"There are {field_count} fields with {dt} datatype"
+        for dt, field_count in dtype_counts.items()
+    )
 
 
 def object_fields_count_stats(dataframe: pd.DataFrame) -> pd.DataFrame:
@@ -72,11 +82,17 @@ def object_fields_count_stats(dataframe: pd.DataFrame) -> pd.DataFrame:
 
     for col in dataframe.select_dtypes("object").columns:
 
-        row_count = len(dataframe)
-        unique_values_count = dataframe[col].nunique()
-        distinct_values_count = (dataframe[col].value_counts() == 1).sum()
-        null_values_count = dataframe[col].isnull().sum()
-        notnull_values_count = dataframe[col].notnull().sum()
+        # Factorize once and count every code in a single pass: nulls are
+        # coded as -1, so shifting the codes puts their count first
+        codes, uniques = pd.factorize(dataframe[col].to_numpy())
+        code_counts = np.bincount(codes + 1, minlength=len(uniques) + 1)
+        item_counts = code_counts[1:]
+
+        row_count = len(codes)
+        unique_values_count = len(uniques)
+        distinct_values_count = int(np.count_nonzero(item_counts == 1))
+        null_values_count = int(code_counts[0])
+        notnull_values_count = row_count - null_values_count
 
         count_stats = {
             "column": col,
@@ -89,7 +105,37 @@ def object_fields_count_stats(dataframe: pd.DataFrame) -> pd.DataFrame:
 
         object_field_count_stats.append(count_stats)
 
-    return pd.DataFrame(object_field_count_stats).set_index("column")
+    # Label the rows with the column names directly, instead of via set_index
+    columns = [stats.pop("column") for stats in object_field_count_stats]
+    return pd.DataFrame(
+        object_field_count_stats, index=pd.Index(columns, name="column")
+    )
+
+
+def length_stats(lengths: np.ndarray) -> tuple:
+    """
+    This function computes the statistics of an array of string lengths from
+    a single histogram of the lengths, instead of separate passes for the
+    longest and shortest lengths and for the number of values having each.
+
+    Args:
+        lengths (np.ndarray): The non-negative integer lengths, at least one.
+
+    Returns:
+        tuple: The longest length, the shortest length, the average length,
+        and the number of values with the longest and the shortest length.
+    """
+    length_counts = np.bincount(lengths)
+    longest = len(length_counts) - 1
+    shortest = int(np.flatnonzero(length_counts)[0])
+    average = float(length_counts @ np.arange(len(length_counts))) / len(lengths)
+    return (
+        longest,
+        shortest,
+        average,
+        int(length_counts[longest]),
+        int(length_counts[shortest]),
+    )
 
 
 def describe_object_fields(dataframe: pd.DataFrame) -> pd.DataFrame:
@@ -107,13 +153,36 @@ def describe_object_fields(dataframe: pd.DataFrame) -> pd.DataFrame:
     object_field_stats = []
 
     for col in dataframe.select_dtypes("object").columns:
-        count = dataframe[col].notnull().sum()
-        unique_values = dataframe[col].nunique()
-        longest_value = dataframe[col].str.len().max()
-        average_length_value = round(dataframe[col].str.len().mean(), 1)
-        shortest_value = dataframe[col].str.len().min()
-        max_value_count = (dataframe[col].str.len() == longest_value).sum()
-        min_value_count = (dataframe[col].str.len() == shortest_value).sum()
+        # Factorize once and measure each unique string only (other values
+        # have no length, as with `.str.len()`), then map the lengths back
+        # onto the non-null rows through their codes
+        codes, uniques = pd.factorize(dataframe[col].to_numpy())
+        is_string = np.fromiter(
+            (isinstance(value, str) for value in uniques),
+            dtype=bool,
+            count=len(uniques),
+        )
+        unique_lengths = np.full(len(uniques), -1, dtype=np.int64)
+        unique_lengths[is_string] = pc.utf8_length(
+            pa.array(uniques[is_string], type=pa.string())
+        ).to_numpy(zero_copy_only=False)
+        lengths = unique_lengths[codes[codes >= 0]]
+        lengths = lengths[lengths >= 0]
+
+        count = int(np.count_nonzero(codes >= 0))
+        unique_values = len(uniques)
+        if len(lengths):
+            (
+                longest_value,
+                shortest_value,
+                average_length_value,
+                max_value_count,
+                min_value_count,
+            ) = length_stats(lengths)
+            average_length_value = round(average_length_value, 1)
+        else:
+            longest_value = shortest_value = average_length_value = np.nan
+            max_value_count = min_value_count = 0
 
         summary_stats = {
             "column": col,
@@ -128,4 +197,6 @@ def describe_object_fields(dataframe: pd.DataFrame) -> pd.DataFrame:
 
         object_field_stats.append(summary_stats)
 
-    return pd.DataFrame(object_field_stats).set_index("column")
+    # Label the rows with the column names directly, instead of via set_index
+    columns = [stats.pop("column") for stats in object_field_stats]
+    return pd.DataFrame(object_field_stats, index=pd.Index(columns, name="column"))
@@ -1,28 +1,78 @@
 """
 This module provides utility functions for handling files and directories.
-It includes functions for reading YAML files, CSV files, creating directories
-and writing to CSV files. The functions are designed to handle exceptions and
-log relevant information for debugging purposes.
+It includes functions for reading YAML files, CSV files, creating directories,
+writing to CSV files, creating HTTP clients and geocoding addresses. The
+functions are designed to handle exceptions and log relevant information for
+debugging purposes.
 """
 
+import asyncio
+import atexit
 import re
+from collections.abc import Iterable
 from csv import DictReader, DictWriter
-from os import makedirs
-from os.path import normpath
+from functools import lru_cache
+from os import makedirs, sep
+from os.path import abspath, getmtime, normpath
+from pathlib import Path
 
+import hishel
 import httpx
+import orjson
+import pandas as pd
 import yaml
+from aiolimiter import AsyncLimiter
 from box import Box
 from rich.table import Table
 
 from src.exception import CustomException
 from src.logger import logger
 
+# Use the libyaml-backed C parser when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
+# Last standalone 4-digit number of a Nominatim display name, i.e. the postcode
+# (the display name ends with the country, so the pattern is not anchored)
+POSTCODE_RE = re.compile(r".* (\d{4})")
+
+# Nominatim search endpoint, identifying the application as its usage policy asks
+NOMINATIM_URL = "https://nominatim.openstreetmap.org/"
+NOMINATIM_HEADERS = {"User-Agent": "Analyzing-Cleanaway-Services"}
+NOMINATIM_TIMEOUT = 10.0
+
+# Successful synchronous address searches, kept for the rest of the process
+SEARCH_RESULTS = {}
+
+
+@lru_cache(maxsize=32)
+def load_yaml(yaml_path: str, mtime: float) -> Box:
+    """
+    This function parses a YAML file into a Box object. Results are cached
+    per path and modification time, so a file is parsed again only after it
+    changes on disk.
+
+    Args:
+        yaml_path (str): The absolute path to the YAML file to be parsed.
+        mtime (float): The modification time of the YAML file, used only as
+            part of the cache key.
+
+    Returns:
+        Box: The content of the YAML file, loaded into a Box object.
+    """
+    with open(yaml_path, "r", encoding="utf-8") as yf:
+        content = Box(yaml.load(yf, Loader=YamlLoader))
+    logger.info("yaml file: %s loaded successfully", yaml_path)
+    return content
+
 
 def read_yaml(yaml_path: str) -> Box:
     """
     This function reads a YAML file from the provided path and returns
-    its content as a Box object.
+    its content as a Box object. Repeated reads of an unchanged file are
+    served from memory.
 
     Args:
         yaml_path (str): The path to the YAML file to be read.
@@ -37,19 +87,19 @@ def read_yaml(yaml_path: str) -> Box:
         easy access and manipulation.
     """
     try:
-        yaml_path = normpath(yaml_path)
-        with open(yaml_path, "r", encoding="utf-8") as yf:
-            content = Box(yaml.safe_load(yf))
-            logger.info("yaml file: %s loaded successfully", yaml_path)
-            return content
+        yaml_path = abspath(yaml_path)
+        return load_yaml(yaml_path, getmtime(yaml_path))
     except Exception as e:
-        logger.error(CustomException(e))
-        raise CustomException(e) from e
+        custom_exception = CustomException(e)
+        logger.error(custom_exception)
+        raise custom_exception from e
 
 
 def create_directories(dir_paths: list, verbose=True) -> None:
     """
-    This function creates directories at the specified paths.
+    This function creates directories at the specified paths. Duplicate
+    paths, and paths that are parents of another listed path, are created
+    only once along with their deepest descendant.
 
     Args:
         dir_paths (list): A list of directory paths where directories need
@@ -57,24 +107,34 @@ def create_directories(dir_paths: list, verbose=True) -> None:
         verbose (bool, optional): If set to True, the function will log
         a message for each directory it creates. Defaults to True.
     """
-    for path in dir_paths:
-        makedirs(normpath(path), exist_ok=True)
+    created = []
+
+    # Deepest paths first, each of them creating its parents on the way
+    for path in sorted({normpath(path) for path in dir_paths}, key=len, reverse=True):
+        if any(created_path.startswith(path + sep) for created_path in created):
+            continue
+        makedirs(path, exist_ok=True)
+        created.append(path)
         if verbose:
             logger.info("created directory at: %s", path)
 
 
-def write_to_csv(csv_filepath: str, data: dict, verbose: bool = False) -> None:
+def write_rows_to_csv(
+    csv_filepath: str, rows: Iterable[dict], fieldnames: list, verbose: bool = False
+) -> None:
     """
-    This function writes a dictionary to a CSV file. If the file
-    does not exist, it will be created.
+    This function appends rows of dictionaries to a CSV file in one go,
+    opening the file only once for the whole batch. If the file does not
+    exist, it will be created along with its headers.
 
     Args:
-        csv_filepath (str): The path to the CSV file to which the data
+        csv_filepath (str): The path to the CSV file to which the rows
             should be written.
-        data (dict): The data to be written to the CSV file. The keys of the
-            dictionary are used as field names.
-        verbose (bool, optional): If True, the function will log the data
-            that was written to the CSV file. Defaults to False.
+        rows (Iterable[dict]): The rows to be written to the CSV file, as a
+            list or any other iterable (e.g. a generator) of dictionaries.
+        fieldnames (list): The field names of the CSV file, in column order.
+        verbose (bool, optional): If True, the function will log the number
+            of rows written to the CSV file. Defaults to False.
 
     Raises:
         CustomException: If there is an error while writing to the CSV file,
@@ -86,21 +146,80 @@ def write_to_csv(csv_filepath: str, data: dict, verbose: bool = False) -> None:
 
         # Write to the file (This will create the CSV file if not exists)
         with open(csv_path, "a", newline="", encoding="utf-8") as cf:
-            writer = DictWriter(cf, fieldnames=data.keys())
+            writer = DictWriter(cf, fieldnames=fieldnames)
 
             # Write the headers (only for the first time)
             if cf.tell() == 0:
                 writer.writeheader()
                 logger.info("CSV file: %s created successfully", csv_path)
 
-            # Write the new data rows
-            writer.writerow(data)
+            # Write the new data rows, counting them on the way
+            row_count = 0
+            for row_count, row in enumerate(rows, start=1):
+                writer.writerow(row)
 
             if verbose:
-                logger.info("1 row added: %s", data)
+                logger.info("%s rows added to: %s", row_count, csv_path)
     except Exception as e:
-        logger.error(CustomException(e))
-        raise CustomException(e) from e
+        custom_exception = CustomException(e)
+        logger.error(custom_exception)
+        raise custom_exception from e
+
+
+def write_to_csv(csv_filepath: str, data: dict, verbose: bool = False) -> None:
+    """
+    This function writes a dictionary to a CSV file. If the file
+    does not exist, it will be created. Prefer `write_rows_to_csv` when
+    writing several rows, as this function opens the file for every row.
+
+    Args:
+        csv_filepath (str): The path to the CSV file to which the data
+            should be written.
+        data (dict): The data to be written to the CSV file. The keys of the
+            dictionary are used as field names.
+        verbose (bool, optional): If True, the function will log the data
+            that was written to the CSV file. Defaults to False.
+
+    Raises:
+        CustomException: If there is an error while writing to the CSV file,
+        a CustomException will be raised with the original exception
+        as its argument.
+    """
+    write_rows_to_csv(csv_filepath, [data], list(data.keys()))
+    if verbose:
+        logger.info("1 row added: %s", data)
+
+
+def write_to_parquet(
+    parquet_filepath: str, data: pd.DataFrame, verbose: bool = False
+) -> None:
+    """
+    This function writes a DataFrame to a zstd-compressed Parquet file through
+    pyarrow's columnar encoder, overwriting the file if it exists. Unlike CSV,
+    the column datatypes are preserved in the file.
+
+    Args:
+        parquet_filepath (str): The path to the Parquet file to which the data
+            should be written.
+        data (pd.DataFrame): The data to be written to the Parquet file.
+        verbose (bool, optional): If True, the function will log the number
+            of rows written to the Parquet file. Defaults to False.
+
+    Raises:
+        CustomException: If there is an error while writing to the Parquet
+        file, a CustomException will be raised with the original exception
+        as its argument.
+    """
+    try:
+        parquet_path = normpath(parquet_filepath)
+        data.to_parquet(parquet_path, engine="pyarrow", compression="zstd", index=False)
+
+        if verbose:
+            logger.info("%s rows written to: %s", len(data), parquet_path)
+    except Exception as e:
+        custom_exception = CustomException(e)
+        logger.error(custom_exception)
+        raise custom_exception from e
 
 
 def read_csv(csv_filepath: str, delimiter: str = ",") -> list:
@@ -129,11 +248,143 @@ def read_csv(csv_filepath: str, delimiter: str = ",") -> list:
             logger.info("CSV file: %s loaded successfully", csv_path)
             return list(reader)
     except Exception as e:
-        logger.error(CustomException(e))
-        raise CustomException(e) from e
+        custom_exception = CustomException(e)
+        logger.error(custom_exception)
+        raise custom_exception from e
+
+
+def read_csv_df(csv_filepath: str, delimiter: str = ",") -> pd.DataFrame:
+    """
+    This function reads a CSV file into a pandas DataFrame using the C parser,
+    which keeps the content in typed columns instead of one dictionary per row.
+    Like `read_csv`, empty fields and literal values such as "N/A" or "null"
+    are read as strings rather than turned into missing values.
+
+    Args:
+        csv_filepath (str): The path to the CSV file to be read.
+        delimiter (str, optional): The character used to separate values
+        in the CSV file. Defaults to ",".
+
+    Raises:
+        CustomException: If there is an error in opening or reading the
+        CSV file, a CustomException is raised with the original exception
+        as its argument.
+
+    Returns:
+        pd.DataFrame: The content of the CSV file.
+    """
+    try:
+        csv_path = normpath(csv_filepath)
+        content = pd.read_csv(
+            csv_path,
+            sep=delimiter,
+            engine="c",
+            low_memory=False,
+            keep_default_na=False,
+        )
+        logger.info("CSV file: %s loaded successfully", csv_path)
+        return content
+    except Exception as e:
+        custom_exception = CustomException(e)
+        logger.error(custom_exception)
+        raise custom_exception from e
 
 
-def dict_to_table(data: dict, title: str):
+class RateLimitedTransport(httpx.AsyncBaseTransport):
+    """
+    An asynchronous HTTP transport that paces the requests sent by the
+    transport it wraps through a token bucket. Placed underneath the cache
+    transport, it throttles only the requests actually reaching the network,
+    so responses served from the cache are never delayed.
+
+    Args:
+        transport (httpx.AsyncBaseTransport): The transport sending the
+            requests over the network.
+        limiter (AsyncLimiter): The token bucket pacing the requests.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, limiter: AsyncLimiter):
+        self.transport = transport
+        self.limiter = limiter
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        async with self.limiter:
+            return await self.transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+def create_http_client(
+    headers: dict,
+    timeout: float,
+    limits: httpx.Limits = None,
+    cache_dir: str = None,
+    cache_ttl: int = None,
+    limiter: AsyncLimiter = None,
+) -> httpx.AsyncClient:
+    """
+    This function creates an asynchronous HTTP client that negotiates HTTP/2
+    with servers supporting it, multiplexing concurrent requests over a single
+    connection. When a cache directory is provided, every response is stored
+    on disk regardless of its Cache-Control headers and is served from there
+    on subsequent runs until it expires, skipping the network entirely. When
+    a limiter is provided, the requests reaching the network are paced by it,
+    while cached responses are returned immediately.
+
+    Args:
+        headers (dict): The headers to be sent with every request.
+        timeout (float): The timeout, in seconds, of every request.
+        limits (httpx.Limits, optional): The connection pool limits of the
+            client. Defaults to the httpx defaults.
+        cache_dir (str, optional): The directory where the responses are
+            cached. Defaults to None, which disables the cache.
+        cache_ttl (int, optional): The number of seconds a cached response
+            remains valid. Defaults to None, which never expires it.
+        limiter (AsyncLimiter, optional): The token bucket pacing the network
+            requests. Defaults to None, which leaves them unpaced.
+
+    Returns:
+        httpx.AsyncClient: The (optionally caching) asynchronous HTTP client.
+    """
+    client_kwargs = {"headers": headers, "timeout": timeout, "http2": True}
+    transport_kwargs = {"http2": True}
+    if limits is not None:
+        client_kwargs["limits"] = transport_kwargs["limits"] = limits
+
+    # Pace the network transport itself, beneath the cache, if requested
+    if limiter is not None:
+        client_kwargs["transport"] = RateLimitedTransport(
+            httpx.AsyncHTTPTransport(**transport_kwargs), limiter
+        )
+
+    if cache_dir is None:
+        return httpx.AsyncClient(**client_kwargs)
+
+    storage = hishel.AsyncFileStorage(base_path=Path(cache_dir), ttl=cache_ttl)
+    controller = hishel.Controller(force_cache=True)
+    logger.info("HTTP responses cached at: %s", cache_dir)
+    return hishel.AsyncCacheClient(
+        storage=storage, controller=controller, **client_kwargs
+    )
+
+
+def dict_to_table(data: dict, title: str) -> Table:
+    """
+    This function builds a two-column Rich table out of a dictionary, with
+    the keys as attributes and their stringified values. Rich measures the
+    column widths once, when the table is rendered, and neither column wraps.
+
+    Args:
+        data (dict): The attributes and values to be tabulated.
+        title (str): The title of the table.
+
+    Returns:
+        Table: The Rich table, ready to be printed to a console.
+    """
+    # Stringify the rows upfront
+    rows = [(str(key), str(value)) for key, value in data.items()]
+
     # Create a table
     table = Table(title=title)
 
@@ -141,33 +392,156 @@ def dict_to_table(data: dict, title: str):
     table.add_column(
         "Dataframe Attributes", justify="left", style="bright_cyan", no_wrap=True
     )
-    table.add_column("Value", justify="right", style="bright_magenta")
+    table.add_column("Value", justify="right", style="bright_magenta", no_wrap=True)
 
     # Add rows
-    for key, value in data.items():
-        table.add_row(key, str(value))
+    for row in rows:
+        table.add_row(*row)
     return table
 
 
-def get_lat_long(address):
-    url = f"https://nominatim.openstreetmap.org/?q={address}&format=json"
-    response = httpx.get(url)
+@lru_cache(maxsize=1)
+def nominatim_client() -> httpx.Client:
+    """
+    This function creates, on first use, the keep-alive HTTP client reused by
+    every synchronous address search, and closes it when the process exits.
+
+    Returns:
+        httpx.Client: The Nominatim HTTP client.
+    """
+    client = httpx.Client(
+        http2=True, timeout=NOMINATIM_TIMEOUT, headers=NOMINATIM_HEADERS
+    )
+    atexit.register(client.close)
+    return client
+
+
+def search_address(address: str) -> list:
+    """
+    This function searches an address on Nominatim over a keep-alive client.
+    Successful searches are kept for the rest of the process, while failed
+    ones are retried on the next call.
+
+    Args:
+        address (str): The address to be searched.
+
+    Returns:
+        list: The Nominatim search results, or None if the search failed.
+    """
+    if address in SEARCH_RESULTS:
+        return SEARCH_RESULTS[address]
+    response = nominatim_client().get(
+        NOMINATIM_URL, params={"q": address, "format": "json"}
+    )
     if response.status_code == 200:
-        data = response.json()
+        # Only successful searches are cached, failed ones are retried
+        SEARCH_RESULTS[address] = orjson.loads(response.content)
+        return SEARCH_RESULTS[address]
+    else:
+        return None
+
+
+async def geocode_many(
+    addresses: list,
+    max_connections: int = 10,
+    requests_per_second: float = 1,
+    timeout: float = NOMINATIM_TIMEOUT,
+) -> dict:
+    """
+    This function searches the given addresses on Nominatim concurrently over
+    a single pooled HTTP client, while keeping the request rate within the
+    Nominatim usage policy. Repeated addresses are searched only once, and
+    a search failing with an error does not affect the others.
+
+    Args:
+        addresses (list): The addresses to be searched.
+        max_connections (int, optional): The maximum number of concurrent
+            connections. Defaults to 10.
+        requests_per_second (float, optional): The maximum request rate.
+            Defaults to 1.
+        timeout (float, optional): The timeout, in seconds, of every search.
+            Defaults to the timeout of the synchronous searches.
+
+    Returns:
+        dict: The Nominatim search results keyed by address, or None for the
+        addresses whose search failed.
+    """
+    limiter = AsyncLimiter(max_rate=requests_per_second, time_period=1)
+    limits = httpx.Limits(
+        max_connections=max_connections, max_keepalive_connections=max_connections
+    )
+
+    async def search(client: httpx.AsyncClient, address: str) -> tuple:
+        async with limiter:
+            response = await client.get(
+                NOMINATIM_URL, params={"q": address, "format": "json"}
+            )
+        if response.status_code != 200:
+            return address, None
+        return address, orjson.loads(response.content)
+
+    unique_addresses = list(dict.fromkeys(addresses))
+    async with httpx.AsyncClient(
+        http2=True, timeout=timeout, headers=NOMINATIM_HEADERS, limits=limits
+    ) as client:
+        results = await asyncio.gather(
+            *(search(client, address) for address in unique_addresses),
+            return_exceptions=True,
+        )
+
+    # A failed search (e.g. a timeout) must not discard the others
+    searches = {}
+    for address, result in zip(unique_addresses, results):
+        if isinstance(result, Exception):
+            logger.warning("Search failed for address: %s (%r)", address, result)
+            searches[address] = None
+        else:
+            searches[address] = result[1]
+    return searches
+
+
+def parse_lat_long(data: list) -> dict:
+    """
+    This function parses the latitude and longitude of the best match out of
+    Nominatim search results.
+
+    Args:
+        data (list): The Nominatim search results.
+
+    Returns:
+        dict: The latitude ("lat") and longitude ("long") of the first result,
+        or an error message if the search failed or found nothing.
+    """
+    if data:
         return {"lat": float(data[0]["lat"]), "long": float(data[0]["lon"])}
     else:
         return "Error: Unable to retrieve location information"
 
 
-def get_postcode(address):
-    postcode_pattern = r".* (\d{4})"
-    url = f"https://nominatim.openstreetmap.org/?q={address}&format=json"
-    response = httpx.get(url)
-    if response.status_code == 200:
-        data = response.json()
+def parse_postcode(data: list) -> str:
+    """
+    This function parses the postcode out of Nominatim search results, taken
+    from the display name of the first result having one.
+
+    Args:
+        data (list): The Nominatim search results.
+
+    Returns:
+        str: The postcode, None if no result has one, or an error message if
+        the search failed or found nothing.
+    """
+    if data:
         for loc in data:
-            loc_name = loc["display_name"]
-            if re.findall(postcode_pattern, loc_name):
-                return re.findall(postcode_pattern, loc_name)
+            match = POSTCODE_RE.search(loc["display_name"])
+            if match:
+                return match.group(1)
     else:
         return "Error: Unable to retrieve location information"
+
+
+def get_lat_long(address):
+    return parse_lat_long(search_address(address))
+
+
+def get_postcode(address):
+    return parse_postcode(search_address(address))
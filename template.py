@@ -27,15 +27,21 @@ list_of_files = [
     "LICENSE",
 ]
 
+list_of_files = [os.path.normpath(file_path) for file_path in list_of_files]
+
+# Create the directories, deepest first, skipping the parents already created
+created_dirs = []
+file_dirs = {os.path.dirname(file_path) for file_path in list_of_files} - {""}
+for file_dir in sorted(file_dirs, key=len, reverse=True):
+    if any(created.startswith(file_dir + os.sep) for created in created_dirs):
+        continue
+    os.makedirs(file_dir, exist_ok=True)
+    created_dirs.append(file_dir)
+    logging.info("Creating directory: %s", file_dir)
+
 # Iterate over file and create them
 for file_path in list_of_files:
-    file_path = os.path.normpath(file_path)
-    file_dir, file_name = os.path.split(file_path)
-
-    # Create directory if not exist
-    if file_dir != "":
-        os.makedirs(file_dir, exist_ok=True)
-        logging.info("Creating directory: %s for the file %s", file_dir, file_name)
+    file_name = os.path.basename(file_path)
 
     # Create file if not exists or if the file is empty
     if (not os.path.exists(file_path)) or (os.path.getsize(file_path) == 0):